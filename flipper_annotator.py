@@ -1,73 +1,138 @@
 import sys
 import os
+import bisect
 import cv2
-from PySide6.QtWidgets import QWidget, QApplication, QMainWindow, QPushButton, QVBoxLayout, QHBoxLayout, QLabel, QSlider, QFileDialog, QMenu, QMenuBar, QSizePolicy
-from PySide6.QtGui import QAction, QShortcut, QKeySequence, QImage, QPixmap, QPainter, QColor, QPen
-from PySide6.QtCore import QTimer, Qt, QRect, Signal
+from PySide6.QtWidgets import QWidget, QApplication, QMainWindow, QPushButton, QVBoxLayout, QHBoxLayout, QLabel, QSlider, QSpinBox, QFileDialog, QMenu, QMenuBar, QSizePolicy
+from PySide6.QtGui import QAction, QShortcut, QKeySequence, QImage, QPixmap, QPainter, QColor, QPen, QFont
+from PySide6.QtCore import QTimer, QElapsedTimer, Qt, QRect, Signal, QObject, QRunnable, QThreadPool
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-from scipy.stats import linregress
 
 class CustomTimeline(QWidget):
     frameSelected = Signal(int)  # Signal to emit when a frame is selected
 
+    # Paint resources shared by every repaint
+    _COLORS = {
+        "Upside Down": QColor(30, 136, 229),  # Blue
+        "Right Side Up": QColor(0, 77, 64),  # Green
+        "Being flipped": QColor(255, 165, 0),  # Orange
+    }
+    _DEFAULT_COLOR = QColor(0, 0, 0)
+    _BACKGROUND_COLOR = QColor(255, 255, 255)
+    _INDICATOR_PEN = QPen(QColor(216, 27, 96), 2)  # Magenta
+    _BORDER_PEN = QPen(QColor(0, 0, 0), 1)
+
+    # Color lookup by type index; unknown types map to the trailing default color
+    _TYPE_IDX = {annotation_type: i for i, annotation_type in enumerate(_COLORS)}
+    _COLOR_TABLE = list(_COLORS.values()) + [_DEFAULT_COLOR]
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.current_frame = 0
-        self.annotations = []
         self.total_frames = 0
 
+        # Per-annotation arrays, rebuilt whenever the annotations change
+        self._starts = np.empty(0, dtype=np.int32)
+        self._ends = np.empty(0, dtype=np.int32)
+        self._types = np.empty(0, dtype=np.uint8)
+        self._current_index = None  # Open annotation, drawn on top of the blocks it grows across
+
+        # Pixel coordinates, rebuilt when the annotations or the widget width change
+        self._xs = np.empty(0, dtype=np.int32)
+        self._widths = np.empty(0, dtype=np.int32)
+
     def set_current_frame(self, frame):
+        # Only the strips around the old and new indicator positions need repainting
+        old_x = self._frame_to_x(self.current_frame)
         self.current_frame = frame
-        self.update()
+        new_x = self._frame_to_x(self.current_frame)
+        self.update(QRect(old_x - 2, 0, 5, self.height()))
+        self.update(QRect(new_x - 2, 0, 5, self.height()))
+
+    def _frame_to_x(self, frame):
+        if not self.total_frames:
+            return 0
+        return int(round((frame / self.total_frames) * self.width()))
 
-    def set_annotations(self, annotations, total_frames):
-        self.annotations = annotations
+    def set_annotations(self, starts, ends, types, total_frames, current_index=None):
         self.total_frames = total_frames
+        self._current_index = current_index
+
+        default_idx = len(self._COLORS)
+        self._starts = np.array(starts, dtype=np.int32)
+        self._ends = np.array(ends, dtype=np.int32)
+        self._types = np.fromiter((self._TYPE_IDX.get(annotation_type, default_idx) for annotation_type in types),
+                                  dtype=np.uint8, count=len(types))
+        self._update_coordinates()
         self.update()
 
+    def extend_annotation(self, index, end_frame):
+        # The annotation at index has grown to end_frame; refresh its cached block and
+        # repaint only the strip between its old and new right edges.
+        if not 0 <= index < len(self._ends):
+            return
+        self._ends[index] = end_frame
+        if not self.total_frames:
+            return
+
+        old_right = int(self._xs[index] + self._widths[index])
+        end_x = int(round((end_frame + 1) * (self.width() / self.total_frames)))
+        self._widths[index] = max(end_x - int(self._xs[index]), 1)
+        new_right = int(self._xs[index] + self._widths[index])
+
+        left = min(old_right, new_right)
+        right = max(old_right, new_right)
+        self.update(QRect(left - 1, 0, right - left + 2, self.height()))
+
+    def _update_coordinates(self):
+        if not self.total_frames:
+            self._xs = np.empty(0, dtype=np.int32)
+            self._widths = np.empty(0, dtype=np.int32)
+            return
+
+        # Using (end_frame + 1) ensures the block covers end_frame inclusively.
+        scale = self.width() / self.total_frames
+        self._xs = np.rint(self._starts * scale).astype(np.int32)
+        end_xs = np.rint((self._ends + 1) * scale).astype(np.int32)
+        self._widths = np.maximum(end_xs - self._xs, 1)  # Ensure at least 1 pixel in width
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._update_coordinates()
+
     def paintEvent(self, event):
         painter = QPainter(self)
         rect = self.rect()
+        dirty = event.rect()
 
         # Background
-        painter.fillRect(rect, QColor(255, 255, 255))
+        painter.fillRect(dirty, self._BACKGROUND_COLOR)
 
         if self.total_frames:
-            for annotation in self.annotations:
-                start_frame = annotation['start_frame']
-                end_frame = annotation['end_frame']
-                annotation_type = annotation['type']
-
-                if annotation_type == "Upside Down":
-                    color = QColor(30, 136, 229)  # Blue
-                elif annotation_type == "Right Side Up":
-                    color = QColor(0, 77, 64)  # Green
-                elif annotation_type == "Being flipped":
-                    color = QColor(255, 165, 0)  # Orange
-                else:
-                    color = QColor(0, 0, 0)
-
-                # Compute pixel coordinates
-                # Using (end_frame + 1) ensures the block covers end_frame inclusively.
-                start_x = int(round((start_frame / self.total_frames) * rect.width()))
-                end_x = int(round(((end_frame + 1) / self.total_frames) * rect.width()))
-
-                width = end_x - start_x
-                if width < 1:
-                    width = 1  # Ensure at least 1 pixel in width
-
-                painter.fillRect(QRect(start_x, 0, width, rect.height()), color)
+            # Skip blocks that do not intersect the region being repainted
+            visible = (self._xs <= dirty.right()) & (self._xs + self._widths > dirty.left())
+            draw_current = self._current_index is not None and bool(visible[self._current_index])
+            if draw_current:
+                visible[self._current_index] = False
+
+            height = rect.height()
+            for start_x, width, type_idx in zip(self._xs[visible].tolist(), self._widths[visible].tolist(),
+                                                self._types[visible].tolist()):
+                painter.fillRect(start_x, 0, width, height, self._COLOR_TABLE[type_idx])
+
+            if draw_current:
+                i = self._current_index
+                painter.fillRect(int(self._xs[i]), 0, int(self._widths[i]), height,
+                                 self._COLOR_TABLE[self._types[i]])
 
         # Time indicator line
         if self.total_frames > 0:
-            painter.setPen(QPen(QColor(216, 27, 96), 2))  # Magenta
-            current_x = int(round((self.current_frame / self.total_frames) * rect.width()))
+            painter.setPen(self._INDICATOR_PEN)
+            current_x = self._frame_to_x(self.current_frame)
             painter.drawLine(current_x, 0, current_x, rect.height())
 
         # Border
-        painter.setPen(QPen(QColor(0, 0, 0), 1))
+        painter.setPen(self._BORDER_PEN)
         painter.drawRect(rect.adjusted(0, 0, -1, -1))
 
     def mousePressEvent(self, event):
@@ -75,36 +140,82 @@ class CustomTimeline(QWidget):
             clicked_frame = int((event.position().x() / self.width()) * self.total_frames)
             self.frameSelected.emit(clicked_frame)
 
+def _times_and_durations(starts, ends, video_fps):
+    # Midpoint time and duration in seconds of each annotation, from float64 frame arrays
+    time = (starts + ends) * (0.5 / video_fps)
+    duration = (ends - starts) * (1.0 / video_fps)
+    return time, duration
+
 def create_and_save_plots(annotation_df, video_fps, video_file):
-    # Filter for 'Upside Down' annotations and create a copy
-    upside_down_df = annotation_df[annotation_df['type'] == 'Upside Down'].copy()
-    upside_down_df['time'] = (upside_down_df['start_frame'] + upside_down_df['end_frame']) / 2 / video_fps
-    upside_down_df['time_upside_down'] = (upside_down_df['end_frame'] - upside_down_df['start_frame']) / video_fps
+    # Plotting libraries are slow to import and only needed when saving
+    import matplotlib
+    matplotlib.use('Agg')  # Plots are only saved to disk, never shown
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    from scipy.stats import linregress
+
+    # Pull the 'Upside Down' annotations out as float arrays
+    upside_down = annotation_df['type'].to_numpy() == 'Upside Down'
+    starts = annotation_df['start_frame'].to_numpy(dtype=np.float64)[upside_down]
+    ends = annotation_df['end_frame'].to_numpy(dtype=np.float64)[upside_down]
+    time, time_upside_down = _times_and_durations(starts, ends, video_fps)
 
     # Calculate linear regression
-    slope, intercept, r_value, p_value, std_err = linregress(upside_down_df['time'], upside_down_df['time_upside_down'])
+    slope, intercept, r_value, p_value, std_err = linregress(time, time_upside_down)
 
     # Time vs Time Upside Down Scatter Plot with Regression
-    plt.figure()
-    plt.scatter(upside_down_df['time'], upside_down_df['time_upside_down'], label='Data')
-    plt.plot(upside_down_df['time'], intercept + slope * upside_down_df['time'], 'r', label=f'y = {slope:.2f}x + {intercept:.2f}\n R^2 = {r_value**2:.2f}\n p = {p_value:.4f}')
-    plt.xlabel('Time (s)')
-    plt.ylabel('Righting time (s)')
-    plt.title('Time (s) vs Time to right')
-    plt.legend()
+    fig, ax = plt.subplots()
+    ax.scatter(time, time_upside_down, label='Data')
+    line_x = np.array([time.min(), time.max()])
+    ax.plot(line_x, intercept + slope * line_x, 'r', label=f'y = {slope:.2f}x + {intercept:.2f}\n R^2 = {r_value**2:.2f}\n p = {p_value:.4f}')
+    ax.set_xlabel('Time (s)')
+    ax.set_ylabel('Righting time (s)')
+    ax.set_title('Time (s) vs Time to right')
+    ax.legend()
     time_plot_file = os.path.splitext(video_file)[0] + '_time_plot.png'
-    plt.savefig(time_plot_file)
-    plt.show()
+    fig.savefig(time_plot_file)
+    plt.close(fig)
 
     # Violin + Swarm Plot
-    plt.figure()
-    sns.violinplot(data=upside_down_df, y='time_upside_down', inner=None, color='lightgray')
-    sns.swarmplot(data=upside_down_df, y='time_upside_down', color='black')
-    plt.ylabel('Time Upside Down (s)')
-    plt.title('Violin + Swarm Plot of Time Upside Down')
+    fig, ax = plt.subplots()
+    sns.violinplot(y=time_upside_down, inner=None, color='lightgray', ax=ax)
+    sns.swarmplot(y=time_upside_down, color='black', ax=ax)
+    ax.set_ylabel('Time Upside Down (s)')
+    ax.set_title('Violin + Swarm Plot of Time Upside Down')
     violin_plot_file = os.path.splitext(video_file)[0] + '_violin_plot.png'
-    plt.savefig(violin_plot_file)
-    plt.show()
+    fig.savefig(violin_plot_file)
+    plt.close(fig)
+
+class SaveTaskSignals(QObject):
+    # Both signals carry the CSV path and an error message, empty on success
+    csv_saved = Signal(str, str)  # Signal to emit once the CSV write is done
+    finished = Signal(str, str)  # Signal to emit once the plots are done (or skipped)
+
+class SaveTask(QRunnable):
+    # Writes the annotation CSV and plots on a worker thread
+    def __init__(self, annotation_df, video_fps, file_name):
+        super().__init__()
+        self.annotation_df = annotation_df
+        self.video_fps = video_fps
+        self.file_name = file_name
+        self.signals = SaveTaskSignals()
+        self.setAutoDelete(False)  # The app holds the task (and its signals) until finished is delivered
+
+    def run(self):
+        try:
+            self.annotation_df.to_csv(self.file_name, index=False, lineterminator='\n')
+        except Exception as error:
+            self.signals.csv_saved.emit(self.file_name, str(error))
+            self.signals.finished.emit(self.file_name, 'skipped because the annotations were not saved')
+            return
+        self.signals.csv_saved.emit(self.file_name, '')
+
+        plot_error = ''
+        try:
+            create_and_save_plots(self.annotation_df, self.video_fps, self.file_name)
+        except Exception as error:
+            plot_error = str(error)
+        self.signals.finished.emit(self.file_name, plot_error)
 
 class VideoAnnotationApp(QMainWindow):
     def __init__(self):
@@ -120,6 +231,15 @@ class VideoAnnotationApp(QMainWindow):
         self.video_label = QLabel()
         layout.addWidget(self.video_label)
 
+        # Current annotation text drawn on top of the video, only updated when the annotation changes
+        self.annotation_overlay = QLabel(self.video_label)
+        overlay_font = QFont()
+        overlay_font.setPointSize(24)
+        self.annotation_overlay.setFont(overlay_font)
+        self.annotation_overlay.hide()
+        self._overlay_type = None
+        self._displayed_size = None
+
         # Initialize and add the CustomTimeline widget with a fixed height
         self.timeline = CustomTimeline(self)
         self.timeline.setFixedHeight(20)  # Adjust this value as needed
@@ -165,6 +285,14 @@ class VideoAnnotationApp(QMainWindow):
         self.speed_slider.setFocusPolicy(Qt.StrongFocus)
         self.speed_slider.valueChanged.connect(self.adjust_playback_speed)
 
+        # Number of frames to advance per playback tick; skipped frames are grabbed without colour conversion
+        self.frame_step_spinbox = QSpinBox(self)
+        self.frame_step_spinbox.setPrefix("Frame step: ")
+        self.frame_step_spinbox.setMinimum(1)
+        self.frame_step_spinbox.setMaximum(30)
+        self.frame_step_spinbox.setValue(1)
+        self.frame_step_spinbox.setFocusPolicy(Qt.NoFocus)  # Keep single-key hotkeys working after it is used
+
         # Set the central widget
         central_widget = QWidget()
         central_widget.setLayout(layout)
@@ -182,22 +310,41 @@ class VideoAnnotationApp(QMainWindow):
 
         # Placeholder for video capture
         self.capture = None
+        self._frame_idx = 0  # Index of the next frame the capture will return
+
+        # Display-sized frame buffer reused across frames; (re)allocated when the display size changes
+        self._small_buf = None
+        self._image = None
+
+        # Display size for frames, refreshed on resize
+        self._scaled_size = self.video_label.size()
 
-        # Placeholder for annotations
-        self.annotations = []
+        # Placeholder for annotations, stored as parallel columns kept sorted by start frame
+        # so the start column can be searched with bisect
+        self._anno_start = []
+        self._anno_end = []
+        self._anno_type = []
+        self._max_span = 0  # Upper bound on end_frame - start_frame over all annotations
 
+        # Playback ticks are single-shot and scheduled against a monotonic clock
         self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
         self.timer.timeout.connect(self.next_frame)
+        self._elapsed = QElapsedTimer()
+        self._ticks = 0  # Ticks played since the playback clock was (re)started
+        self._playing = False
 
         # Connect the frameSelected signal from the timeline to the set_frame method
         self.timeline.frameSelected.connect(self.set_frame)
 
-        # Current annotation state
-        self.current_annotation = None
+        # Current annotation state (index into the annotation columns)
+        self._current_index = None
         self.current_annotation_start = None
 
         self.current_video_file = None  # Placeholder for the current video file path
 
+        self._save_task = None  # Save running on the thread pool, if any
+
         # Set up hotkeys
         self.setup_hotkeys()
 
@@ -224,7 +371,17 @@ class VideoAnnotationApp(QMainWindow):
 
         self.speed_slider.setSizePolicy(QSizePolicy.Preferred, QSizePolicy.Fixed)
         self.speed_slider.setMaximumHeight(20)  # Adjust as needed
-        layout.addWidget(self.speed_slider)
+
+        # Place the frame step control next to the speed slider
+        playback_layout = QHBoxLayout()
+        playback_layout.addWidget(self.speed_slider)
+        playback_layout.addWidget(self.frame_step_spinbox)
+        layout.addLayout(playback_layout)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._scaled_size = self.video_label.size()
+        self.position_annotation_overlay()  # The frame re-centers vertically even when its size is unchanged
 
     def setup_hotkeys(self):
         # Play/Pause
@@ -249,14 +406,19 @@ class VideoAnnotationApp(QMainWindow):
         QShortcut(QKeySequence("W"), self, self.load_annotations)
 
     def toggle_play_pause(self):
-        if self.timer.isActive():
+        if self._playing:
             self.play_video()  # This will pause if already playing
         else:
             self.play_video()
 
     def adjust_playback_speed(self, interval):
-        if self.timer.isActive():
-            self.timer.start(interval)
+        if self._playing:
+            self.start_playback_clock()
+
+    def start_playback_clock(self):
+        self._ticks = 0
+        self._elapsed.start()
+        self.timer.start(self.speed_slider.value())  # Use the value from the slider
 
     def trigger_annotation(self, annotation_type):
         for button_text, button in self.annotation_buttons.items():
@@ -268,88 +430,136 @@ class VideoAnnotationApp(QMainWindow):
         if self.capture:
             self.capture.release()
 
-        self.capture = cv2.VideoCapture(file_path)
+        # Prefer hardware-accelerated decoding; hardware acceleration has to be requested when the
+        # file is opened, so fall back to a plain software capture if that fails
+        self.capture = cv2.VideoCapture(file_path, cv2.CAP_FFMPEG,
+                                        [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY])
+        if not self.capture.isOpened():
+            self.capture = cv2.VideoCapture(file_path)
+        self._frame_idx = 0
         self.total_frames = int(self.capture.get(cv2.CAP_PROP_FRAME_COUNT))
         self.play_button.setEnabled(True)
-        self.timeline.set_annotations(self.annotations, self.total_frames)  # Update the custom timeline
+        self.update_timeline()  # Update the custom timeline
         self.current_video_file = file_path  # Store the video file path
 
     def load_annotations(self):
         default_dir = os.path.dirname(self.current_video_file) if self.current_video_file else ''
         file_name, _ = QFileDialog.getOpenFileName(self, "Load Annotations", default_dir, "CSV Files (*.csv)")
         if file_name:
-            self.annotations = pd.read_csv(file_name).to_dict('records')
-            self.timeline.set_annotations(self.annotations, self.total_frames)
+            df = pd.read_csv(file_name).sort_values('start_frame', kind='stable')
+            self.replace_annotations(df['start_frame'].tolist(), df['end_frame'].tolist(), df['type'].tolist())
             print(f'Annotations loaded from: {file_name}')
 
     def play_video(self):
-        if not self.timer.isActive():
-            self.timer.start(self.speed_slider.value())  # Use the value from the slider
+        if not self._playing:
+            self._playing = True
+            self.start_playback_clock()
             self.play_button.setText('Pause')
         else:
+            self._playing = False
             self.timer.stop()
             self.play_button.setText('Play')
 
     def next_frame(self):
         if self.capture and self.capture.isOpened():
-            current_frame = int(self.capture.get(cv2.CAP_PROP_POS_FRAMES))
-            ret, frame = self.capture.read()
+            # Advance past skipped frames; grab() skips the colour conversion and copy into Python
+            ret = True
+            for _ in range(self.frame_step_spinbox.value() - 1):
+                ret = self.capture.grab()
+                if not ret:
+                    break
+                self._frame_idx += 1
+
+            current_frame = self._frame_idx
+            if ret:
+                ret = self.capture.grab()
+            if ret:
+                # Convert and copy out only the frame that is actually displayed
+                self._frame_idx += 1
+                ret, frame = self.capture.retrieve()
             if ret:
                 self.display_frame(frame)
                 self.timeline.set_current_frame(current_frame)
 
-                if self.current_annotation:
+                if self._current_index is not None:
                     # Extend the end frame of the current annotation
-                    self.current_annotation['end_frame'] = current_frame
-                    self.timeline.set_annotations(self.annotations, self.total_frames)
+                    self.extend_current_annotation(current_frame)
+                    self.timeline.extend_annotation(self._current_index, current_frame)
             else:
-                self.timer.stop()
+                self._playing = False
                 self.play_button.setText('Play')
-        self.timer.start(self.speed_slider.value())
 
-    def display_frame(self, frame):
-        # Convert the frame color to RGB
-        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-
-        # Display current annotation text overlay
-        text_scale = 3
-        text_thickness = 4
-        rect_height = 80
-        rect_margin = 10
-        rect_width = 700
-        text_x = frame.shape[1] - rect_width - rect_margin
-        text_y = 120
-
-        if self.current_annotation and isinstance(self.current_annotation, dict):
-            annotation_type = self.current_annotation['type']
-            if annotation_type == "Upside Down":
-                color = (30, 136, 229)
-            elif annotation_type == "Right Side Up":
-                color = (0, 77, 64)
-            elif annotation_type == "Being flipped":
-                color = (255, 165, 0)
+        if self._playing:
+            # Schedule the next tick from the wall clock so time spent on this frame does not add up
+            interval = self.speed_slider.value()
+            self._ticks += 1
+            delay = (self._ticks + 1) * interval - self._elapsed.elapsed()
+            if delay < -interval:
+                # More than a tick behind (e.g. after a stall); resync rather than racing through frames
+                self.start_playback_clock()
             else:
-                color = (0, 0, 0)
-
-            # Draw rectangle background for text
-            cv2.rectangle(frame, (text_x, text_y - rect_height), (text_x + rect_width, text_y), (255, 255, 255), -1)
+                self.timer.start(max(0, delay))
 
-            # Draw text
-            cv2.putText(frame, annotation_type,
-                        (text_x, text_y - rect_margin),
-                        cv2.FONT_HERSHEY_SIMPLEX, text_scale,
-                        color, text_thickness, cv2.LINE_AA)
-
-        # Convert to QPixmap
-        image = QImage(frame, frame.shape[1], frame.shape[0], QImage.Format_RGB888)
-        pixmap = QPixmap.fromImage(image)
-        self.video_label.setPixmap(pixmap.scaled(self.video_label.size(), Qt.KeepAspectRatio))
+    def display_frame(self, frame):
+        # Downscale to the display size first, keeping the aspect ratio, so the
+        # QImage only touches a display-sized buffer
+        frame_height, frame_width = frame.shape[:2]
+        scale = min(self._scaled_size.width() / frame_width, self._scaled_size.height() / frame_height)
+        target_size = (max(1, int(frame_width * scale)), max(1, int(frame_height * scale)))
+        if self._small_buf is None or self._small_buf.shape[1::-1] != target_size:
+            self._small_buf = np.empty((target_size[1], target_size[0], 3), dtype=np.uint8)
+
+        # Favor speed while playing and quality for a paused frame
+        interpolation = cv2.INTER_NEAREST if self._playing else cv2.INTER_AREA
+        frame = cv2.resize(frame, target_size, dst=self._small_buf, interpolation=interpolation)
+
+        # Qt reads OpenCV's BGR layout directly; the QImage is a view over self._small_buf,
+        # which stays alive until the next frame overwrites it
+        height, width = frame.shape[:2]
+        self._image = QImage(frame.data, width, height, frame.strides[0], QImage.Format_BGR888)
+        pixmap = QPixmap.fromImage(self._image)
+        self.video_label.setPixmap(pixmap)
+
+        # Keep the overlay anchored to the frame when the displayed size changes
+        if pixmap.size() != self._displayed_size:
+            self._displayed_size = pixmap.size()
+            self.position_annotation_overlay()
+
+    def update_annotation_overlay(self):
+        annotation_type = self._anno_type[self._current_index] if self._current_index is not None else None
+        if annotation_type == self._overlay_type:
+            return
+        self._overlay_type = annotation_type
+
+        if annotation_type is None:
+            self.annotation_overlay.hide()
+            return
+
+        color = CustomTimeline._COLORS.get(annotation_type, CustomTimeline._DEFAULT_COLOR)
+        self.annotation_overlay.setStyleSheet(f"QLabel {{ color: {color.name()}; background-color: white; }}")
+        self.annotation_overlay.setText(annotation_type)
+        self.annotation_overlay.adjustSize()
+        self.position_annotation_overlay()
+        self.annotation_overlay.show()
+
+    def position_annotation_overlay(self):
+        # Anchor to the top-right corner of the displayed frame (left-aligned, vertically centered)
+        margin = 10
+        pixmap = self.video_label.pixmap()
+        if pixmap.isNull():
+            frame_width, frame_top = self.video_label.width(), 0
+        else:
+            frame_width = pixmap.width()
+            frame_top = (self.video_label.height() - pixmap.height()) // 2
+        self.annotation_overlay.move(frame_width - self.annotation_overlay.width() - margin, frame_top + margin)
 
     def set_frame(self, frame_number):
         if self.capture and self.capture.isOpened():
             self.capture.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
+            self._frame_idx = frame_number
             ret, frame = self.capture.read()
             if ret:
+                self._frame_idx += 1
                 self.display_frame(frame)
                 self.timeline.set_current_frame(frame_number)
 
@@ -373,59 +583,85 @@ class VideoAnnotationApp(QMainWindow):
         current_frame = self.get_current_video_frame()
 
         # End the current annotation if any
-        if self.current_annotation:
-            self.current_annotation['end_frame'] = current_frame
-            self.current_annotation = None
+        if self._current_index is not None:
+            self.extend_current_annotation(current_frame)
+            self._current_index = None
 
         # Process overlapping annotations first
         self.process_overlapping_annotations(current_frame)
 
         # Start a new annotation
-        self.current_annotation = {
-            'start_frame': current_frame,
-            'end_frame': current_frame,
-            'type': new_annotation_type
-        }
-        self.annotations.append(self.current_annotation)
+        self._current_index = self.insert_annotation(current_frame, current_frame, new_annotation_type)
+        self.update_annotation_overlay()
 
         # Update the custom timeline with new annotations
-        self.timeline.set_annotations(self.annotations, self.total_frames)
+        self.update_timeline()
 
     def process_overlapping_annotations(self, current_frame):
-        updated_annotations = []
-        for annotation in self.annotations:
+        # Only annotations starting within _max_span frames before current_frame can cover it
+        lo = bisect.bisect_left(self._anno_start, current_frame - self._max_span)
+        hi = bisect.bisect_right(self._anno_start, current_frame)
+
+        trailing_parts = []
+        for i in range(hi - 1, lo - 1, -1):
+            end_frame = self._anno_end[i]
             # Check if current_frame lies within this annotation
-            if annotation['start_frame'] <= current_frame <= annotation['end_frame']:
-                # If part of the annotation is before current_frame
-                if annotation['start_frame'] < current_frame:
-                    updated_annotations.append({
-                        'start_frame': annotation['start_frame'],
-                        'end_frame': current_frame - 1,
-                        'type': annotation['type']
-                    })
-
-                # If part of the annotation is after current_frame
-                if annotation['end_frame'] > current_frame:
-                    updated_annotations.append({
-                        'start_frame': current_frame + 1,
-                        'end_frame': annotation['end_frame'],
-                        'type': annotation['type']
-                    })
-
-                # The frame at `current_frame` is effectively "freed up"
-                # by not adding any annotation covering this exact frame.
-            else:
-                # No overlap; keep the annotation as is.
-                updated_annotations.append(annotation)
+            if end_frame < current_frame:
+                continue
 
-        self.annotations = updated_annotations
+            # If part of the annotation is after current_frame
+            if end_frame > current_frame:
+                trailing_parts.append((current_frame + 1, end_frame, self._anno_type[i]))
+
+            # If part of the annotation is before current_frame, it keeps its position
+            if self._anno_start[i] < current_frame:
+                self._anno_end[i] = current_frame - 1
+            else:
+                del self._anno_start[i]
+                del self._anno_end[i]
+                del self._anno_type[i]
+
+            # The frame at `current_frame` is effectively "freed up"
+            # by not adding any annotation covering this exact frame.
+
+        for start_frame, end_frame, annotation_type in reversed(trailing_parts):
+            self.insert_annotation(start_frame, end_frame, annotation_type)
+
+    def extend_current_annotation(self, end_frame):
+        self._anno_end[self._current_index] = end_frame
+        self._max_span = max(self._max_span, end_frame - self._anno_start[self._current_index])
+
+    def insert_annotation(self, start_frame, end_frame, annotation_type):
+        index = bisect.bisect_right(self._anno_start, start_frame)
+        self._anno_start.insert(index, start_frame)
+        self._anno_end.insert(index, end_frame)
+        self._anno_type.insert(index, annotation_type)
+        self._max_span = max(self._max_span, end_frame - start_frame)
+        return index
+
+    def replace_annotations(self, starts, ends, types):
+        # Columns must already be sorted by start frame; any open annotation is dropped
+        self._anno_start = starts
+        self._anno_end = ends
+        self._anno_type = types
+        self._max_span = max((end - start for start, end in zip(starts, ends)), default=0)
+        self._current_index = None
+        self.update_annotation_overlay()
+        self.update_timeline()
+
+    def update_timeline(self):
+        self.timeline.set_annotations(self._anno_start, self._anno_end, self._anno_type, self.total_frames,
+                                      self._current_index)
 
     def get_current_video_frame(self):
         if self.capture:
-            return int(self.capture.get(cv2.CAP_PROP_POS_FRAMES))
+            return self._frame_idx
         return 0
 
     def save_annotations(self):
+        if self._save_task is not None:
+            return  # A save is already in progress
+
         if self.current_video_file:
             default_save_path = os.path.splitext(self.current_video_file)[0] + '.csv'
         else:
@@ -434,14 +670,50 @@ class VideoAnnotationApp(QMainWindow):
         file_name, _ = QFileDialog.getSaveFileName(self, "Save Annotations", default_save_path, "CSV Files (*.csv)")
         if file_name:
             # Save annotations to CSV
-            df = pd.DataFrame(self.annotations)
+            df = pd.DataFrame({
+                'start_frame': self._anno_start,
+                'end_frame': self._anno_end,
+                'type': self._anno_type
+            })
+            video_fps = self.capture.get(cv2.CAP_PROP_FPS)  # Get the FPS of the video
             print(f'saving annotations and plots to: {file_name}')
-            df.to_csv(file_name, index=False)
-            self.annotations = []
 
-            # Create and save plots
-            video_fps = self.capture.get(cv2.CAP_PROP_FPS)  # Get the FPS of the video
-            create_and_save_plots(df, video_fps, file_name)
+            # Take the saved rows out of the live columns now, closing any open annotation, so
+            # annotations made while the worker runs stay in memory; they are merged back if the
+            # CSV write fails
+            self.replace_annotations([], [], [])
+
+            # Write the CSV and create the plots off the GUI thread
+            self.save_button.setEnabled(False)
+            self._save_task = SaveTask(df, video_fps, file_name)
+            self._save_task.signals.csv_saved.connect(self.csv_saved)
+            self._save_task.signals.finished.connect(self.save_finished)
+            QThreadPool.globalInstance().start(self._save_task)
+
+    def csv_saved(self, file_name, error):
+        if error:
+            print(f'Error: annotations could not be saved to {file_name}, keeping them in memory: {error}')
+            self.restore_annotations(self._save_task.annotation_df)
+            return
+        print(f'annotations saved to: {file_name}')
+
+    def restore_annotations(self, annotation_df):
+        # Merge rows back into the live columns in sorted order, keeping the open annotation's index valid
+        for start_frame, end_frame, annotation_type in zip(annotation_df['start_frame'].tolist(),
+                                                           annotation_df['end_frame'].tolist(),
+                                                           annotation_df['type'].tolist()):
+            index = self.insert_annotation(start_frame, end_frame, annotation_type)
+            if self._current_index is not None and index <= self._current_index:
+                self._current_index += 1
+        self.update_timeline()
+
+    def save_finished(self, file_name, error):
+        self._save_task = None
+        self.save_button.setEnabled(True)
+        if error:
+            print(f'Error: plots for {file_name} were not created: {error}')
+        else:
+            print(f'plots saved for: {file_name}')
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)